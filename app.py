@@ -1,9 +1,18 @@
 # app.py
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, render_template, Response, stream_with_context
 from flask_mail import Mail, Message
+import copy
+import orjson
 import os
 import logging
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from email.utils import make_msgid
+from string import Template
 from dotenv import load_dotenv
 import database  # Our database module
 
@@ -27,70 +36,212 @@ mail = Mail(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Send notification emails from a background thread so the SMTP round-trip
+# to smtp.gmail.com (often 300-2000 ms) never blocks a request handler
+email_queue = queue.Queue()
+
+def _email_worker():
+    while True:
+        msg = email_queue.get()
+        try:
+            with app.app_context():
+                mail.send(msg)
+            logger.info("Notification email sent successfully")
+        except Exception as e:
+            logger.error(f"Failed to send email: {str(e)}")
+        finally:
+            email_queue.task_done()
+
+threading.Thread(target=_email_worker, daemon=True).start()
+
+# Email bodies are built once at import time; per-request we only substitute
+# the fields. This also drops the block indentation the old inline f-strings
+# carried into every SMTP payload.
+CLINIC_TMPL = Template("""\
+New appointment request received:
+
+ID: #$id
+👤 Name: $name
+📞 Phone: $phone
+📧 Email: $email
+🏥 Service: $service
+💬 Message: $message
+
+⏰ Received at: $timestamp
+
+Please contact the patient within 24 hours.
+""")
+
+PATIENT_TMPL = Template("""\
+Dear $name,
+
+Thank you for your appointment request with Chember Ortho and Pain Rehab Clinic.
+
+We have received your request for: $service
+
+Our team will contact you at $phone within 24 hours to confirm your appointment.
+
+If you have any urgent questions, please call us at +91 79807 17479.
+
+Best regards,
+Chember Clinic Team
+""")
+
+# Build the Message envelopes once (header setup, boundary generation) and
+# shallow-copy them per request, reassigning only subject/recipients/body.
+# Construction needs an app context to resolve the default sender.
+with app.app_context():
+    _CLINIC_MSG_PROTO = Message(subject="", recipients=[])
+    _PATIENT_MSG_PROTO = Message(
+        subject="Appointment Request Received - Chember Clinic",
+        recipients=[]
+    )
+
+# Coalesce bursts of appointment INSERTs into one transaction. Each pending
+# row carries a Future that the flusher resolves with the assigned row id, so
+# save_appointment_to_db still returns an ID synchronously. The flusher wakes
+# as soon as a row arrives, sleeps briefly to let a burst accumulate, then
+# writes the whole batch with executemany under a single commit - one fsync
+# for the batch instead of one per appointment. With WAL + synchronous=NORMAL
+# a crash can lose at most one flush interval of rows.
+_insert_buffer = deque()
+_insert_lock = threading.Lock()
+_insert_pending = threading.Event()
+FLUSH_INTERVAL = 0.02  # seconds to wait for a burst to accumulate
+
+def _insert_flusher():
+    while True:
+        _insert_pending.wait()
+        time.sleep(FLUSH_INTERVAL)
+        with _insert_lock:
+            batch = list(_insert_buffer)
+            _insert_buffer.clear()
+            _insert_pending.clear()
+        if not batch:
+            continue
+        try:
+            conn = database.get_db_connection()
+            c = conn.cursor()
+            c.executemany('''
+            INSERT INTO appointments (name, phone, email, service, message)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [row for row, _ in batch])
+            conn.commit()
+            # lastrowid is unset after executemany, so ask SQLite directly
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            first_id = last_id - len(batch) + 1
+            for i, (_, future) in enumerate(batch):
+                future.set_result(first_id + i)
+        except Exception as e:
+            logger.error(f"Error flushing appointment batch: {str(e)}")
+            for _, future in batch:
+                future.set_result(None)
+
+threading.Thread(target=_insert_flusher, daemon=True).start()
+
+def ojson(payload, status=200):
+    """jsonify replacement backed by orjson (~3x faster parse/serialize)"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+# Mail settings are read from the environment once at startup and never
+# change afterwards, so check them once instead of on every request
+_GMAIL_OK = all([
+    app.config['MAIL_USERNAME'],
+    app.config['MAIL_PASSWORD'],
+    app.config['MAIL_DEFAULT_SENDER']
+])
+
 def is_gmail_configured():
     """Check if Gmail is properly configured"""
-    return all([
-        app.config['MAIL_USERNAME'],
-        app.config['MAIL_PASSWORD'],
-        app.config['MAIL_DEFAULT_SENDER']
-    ])
+    return _GMAIL_OK
 
 def save_appointment_to_db(appointment_data):
-    """Save appointment to SQLite database"""
+    """Save appointment to SQLite database via the batching flusher"""
     try:
-        conn = database.get_db_connection()
-        c = conn.cursor()
-        
-        c.execute('''
-        INSERT INTO appointments (name, phone, email, service, message)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (
+        row = (
             appointment_data['name'],
             appointment_data['phone'],
             appointment_data.get('email', ''),
             appointment_data.get('service', ''),
             appointment_data.get('message', '')
-        ))
-        
-        conn.commit()
-        appointment_id = c.lastrowid
-        conn.close()
-        
-        logger.info(f"Appointment saved to database with ID: {appointment_id}")
+        )
+        future = Future()
+        with _insert_lock:
+            _insert_buffer.append((row, future))
+            _insert_pending.set()
+
+        appointment_id = future.result(timeout=5)
+        if appointment_id:
+            logger.info(f"Appointment saved to database with ID: {appointment_id}")
+            _bump_today_count()
         return appointment_id
-        
+
     except Exception as e:
         logger.error(f"Error saving to database: {str(e)}")
         return None
 
+# Today's count is kept in process rather than re-queried per request: the
+# counter is monotonically increasing within a day and the insert path knows
+# it just added a row, so SQLite is only consulted once per day boundary (or
+# on first use after startup). Counts are per worker process, which is fine
+# for an informational figure. created_at is stored in UTC, so day rollover
+# is tracked in UTC too.
+_today_counter = {'date': None, 'count': 0}
+_today_counter_lock = threading.Lock()
+
+def _query_today_count():
+    """COUNT(*) over today's rows from SQLite"""
+    conn = database.get_db_connection()
+    c = conn.cursor()
+
+    # Range predicate on the bare column (rather than DATE(created_at))
+    # so the planner can use idx_appt_created instead of scanning
+    c.execute('''
+    SELECT COUNT(*) as count FROM appointments
+    WHERE created_at >= datetime('now', 'start of day')
+      AND created_at <  datetime('now', 'start of day', '+1 day')
+    ''')
+
+    result = c.fetchone()
+    return result['count'] if result else 0
+
 def get_appointment_count_today():
-    """Get count of appointments created today"""
+    """Get count of appointments created today (maintained in-process)"""
+    today = datetime.now(timezone.utc).date()
+    with _today_counter_lock:
+        if _today_counter['date'] == today:
+            return _today_counter['count']
+
     try:
-        conn = database.get_db_connection()
-        c = conn.cursor()
-        
-        c.execute('''
-        SELECT COUNT(*) as count FROM appointments 
-        WHERE DATE(created_at) = DATE('now')
-        ''')
-        
-        result = c.fetchone()
-        conn.close()
-        
-        return result['count'] if result else 0
-        
+        count = _query_today_count()
     except Exception as e:
         logger.error(f"Error getting appointment count: {str(e)}")
         return 0
 
+    with _today_counter_lock:
+        _today_counter['date'] = today
+        _today_counter['count'] = count
+        return count
+
+def _bump_today_count():
+    """Record a fresh insert without touching the database"""
+    today = datetime.now(timezone.utc).date()
+    with _today_counter_lock:
+        if _today_counter['date'] == today:
+            _today_counter['count'] += 1
+            return
+    # Day rolled over (or first insert since startup) - reload once from
+    # SQLite; the fresh count already includes the row just written
+    get_appointment_count_today()
+
 @app.route('/')
 def index():
-    return jsonify({"message": "API is running"})
+    return ojson({"message": "API is running"})
 
 @app.route('/book-appointment', methods=['POST'])
 def book_appointment():
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         
         # Extract form data
         name = data.get('name')
@@ -101,16 +252,16 @@ def book_appointment():
         
         # Basic validation
         if not name or not phone:
-            return jsonify({'success': False, 'message': 'Name and phone number are required.'})
+            return ojson({'success': False, 'message': 'Name and phone number are required.'})
         
-        # Create appointment record
+        # Create appointment record (created_at is filled in by SQLite's
+        # DEFAULT CURRENT_TIMESTAMP, so no timestamp formatting here)
         appointment = {
             'name': name,
             'phone': phone,
             'email': email,
             'service': service,
-            'message': message,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'message': message
         }
         
         # Save to database
@@ -118,7 +269,7 @@ def book_appointment():
         
         if not appointment_id:
             logger.error("Failed to save appointment to database")
-            return jsonify({
+            return ojson({
                 'success': False, 
                 'message': 'Failed to save appointment. Please try again or call us directly.'
             })
@@ -131,56 +282,45 @@ def book_appointment():
         if is_gmail_configured():
             try:
                 # Email to clinic
-                clinic_msg = Message(
-                    subject=f"📅 New Appointment Request from {name}",
-                    recipients=[app.config['MAIL_DEFAULT_SENDER']],
-                    body=f"""
-                    New appointment request received:
-                    
-                    ID: #{appointment_id}
-                    👤 Name: {name}
-                    📞 Phone: {phone}
-                    📧 Email: {email or 'Not provided'}
-                    🏥 Service: {service}
-                    💬 Message: {message or 'No message'}
-                    
-                    ⏰ Received at: {appointment['timestamp']}
-                    
-                    Please contact the patient within 24 hours.
-                    """
+                clinic_msg = copy.copy(_CLINIC_MSG_PROTO)
+                # The prototype's Message-ID was generated once in __init__;
+                # reuse would make MTAs dedupe/thread the notifications
+                clinic_msg.msgId = make_msgid()
+                clinic_msg.subject = f"📅 New Appointment Request from {name}"
+                clinic_msg.recipients = [app.config['MAIL_DEFAULT_SENDER']]
+                clinic_msg.body = CLINIC_TMPL.substitute(
+                    id=appointment_id,
+                    name=name,
+                    phone=phone,
+                    email=email or 'Not provided',
+                    service=service,
+                    message=message or 'No message',
+                    # isoformat is cheaper than strftime and only runs
+                    # when an email actually goes out
+                    timestamp=datetime.now().isoformat(sep=' ', timespec='seconds')
                 )
-                mail.send(clinic_msg)
-                
+                email_queue.put(clinic_msg)
+
                 # Optional: Send confirmation email to patient if they provided email
                 if email:
                     try:
-                        patient_msg = Message(
-                            subject=f"Appointment Request Received - Chember Clinic",
-                            recipients=[email],
-                            body=f"""
-                            Dear {name},
-                            
-                            Thank you for your appointment request with Chember Ortho and Pain Rehab Clinic.
-                            
-                            We have received your request for: {service}
-                            
-                            Our team will contact you at {phone} within 24 hours to confirm your appointment.
-                            
-                            If you have any urgent questions, please call us at +91 79807 17479.
-                            
-                            Best regards,
-                            Chember Clinic Team
-                            """
+                        patient_msg = copy.copy(_PATIENT_MSG_PROTO)
+                        patient_msg.msgId = make_msgid()
+                        patient_msg.recipients = [email]
+                        patient_msg.body = PATIENT_TMPL.substitute(
+                            name=name,
+                            service=service,
+                            phone=phone
                         )
-                        mail.send(patient_msg)
+                        email_queue.put(patient_msg)
                     except Exception as e:
-                        logger.warning(f"Could not send confirmation to patient: {str(e)}")
-                
+                        logger.warning(f"Could not queue confirmation to patient: {str(e)}")
+
                 email_sent = True
-                logger.info("Notification emails sent successfully")
-                
+                logger.info("Notification emails queued for sending")
+
             except Exception as e:
-                logger.error(f"Failed to send email: {str(e)}")
+                logger.error(f"Failed to queue email: {str(e)}")
                 email_sent = False
         else:
             logger.warning("Gmail not configured - skipping email notification")
@@ -192,7 +332,7 @@ def book_appointment():
         if not email_sent:
             response_message += ' Please call us directly at +91 79807 17479 if you need urgent appointment.'
         
-        return jsonify({
+        return ojson({
             'success': True, 
             'message': response_message,
             'appointment_id': appointment_id,
@@ -201,7 +341,7 @@ def book_appointment():
         
     except Exception as e:
         logger.error(f"Error processing appointment: {str(e)}")
-        return jsonify({
+        return ojson({
             'success': False, 
             'message': 'An error occurred while processing your request. Please call us at +91 79807 17479.'
         })
@@ -212,70 +352,103 @@ def get_appointments():
     try:
         conn = database.get_db_connection()
         c = conn.cursor()
-        
+        # Plain tuples for this query - dict(zip(cols, row)) with column
+        # names read once from cursor.description beats per-row sqlite3.Row
+        # key dispatch
+        c.row_factory = None
+
         # Get query parameters for filtering
         status = request.args.get('status', 'all')
-        limit = request.args.get('limit', 50)
+
+        # Coerce limit to a real, capped integer so SQLite binds an int and a
+        # huge limit can't balloon the response
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        except (TypeError, ValueError):
+            limit = 50
         
+        # Two statements rather than one WHERE (? = 'all' OR status = ?):
+        # the OR form makes the planner scan idx_appt_created for both cases,
+        # while separate texts let the filtered query take the bounded
+        # idx_appt_status_created range. The per-thread connection's
+        # statement cache reuses both prepared forms anyway.
         if status == 'all':
             c.execute('''
-            SELECT * FROM appointments 
-            ORDER BY created_at DESC 
+            SELECT * FROM appointments
+            ORDER BY created_at DESC
             LIMIT ?
             ''', (limit,))
         else:
             c.execute('''
-            SELECT * FROM appointments 
+            SELECT * FROM appointments
             WHERE status = ?
-            ORDER BY created_at DESC 
+            ORDER BY created_at DESC
             LIMIT ?
             ''', (status, limit))
-        
-        appointments = c.fetchall()
-        conn.close()
-        
-        # Convert to list of dictionaries
-        appointments_list = []
-        for appt in appointments:
-            appointments_list.append(dict(appt))
-        
-        return jsonify({
-            'success': True,
-            'count': len(appointments_list),
-            'appointments': appointments_list
-        })
-        
+
+        # Stream rows straight off the cursor instead of materializing the
+        # whole result as a list plus one big JSON string - peak memory stays
+        # flat and the first bytes ship before the scan finishes
+        cols = [d[0] for d in c.description]
+
+        def generate():
+            yield b'{"success": true, "appointments": ['
+            count = 0
+            for row in c:
+                yield (b',' if count else b'') + orjson.dumps(dict(zip(cols, row)))
+                count += 1
+            yield b'], "count": %d}' % count
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
     except Exception as e:
         logger.error(f"Error fetching appointments: {str(e)}")
-        return jsonify({
+        return ojson({
             'success': False, 
             'message': 'Error fetching appointments'
         })
 
+# Load balancers poll /health every few seconds, sometimes in bursts; cache
+# the serialized payload for a second so check storms cost one DB probe
+HEALTH_CACHE_TTL = 1  # seconds
+_health_cache = {'body': b'', 'expires': 0.0}
+_health_cache_lock = threading.Lock()
+
 @app.route('/health')
 def health_check():
-    gmail_configured = is_gmail_configured()
-    
-    # Check database health
+    with _health_cache_lock:
+        if time.monotonic() < _health_cache['expires']:
+            return Response(_health_cache['body'], mimetype='application/json')
+
+    # Check database health - one execute on the pooled connection, no
+    # cursor allocation
     db_health = False
     try:
         conn = database.get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT 1')
+        conn.execute('SELECT 1').fetchone()
         db_health = True
-        conn.close()
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
-    
-    return jsonify({
-        'status': 'healthy', 
+
+    body = orjson.dumps({
+        'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'email_configured': gmail_configured,
+        'email_configured': is_gmail_configured(),
         'database_healthy': db_health,
         'service': 'Chember Ortho and Pain Rehab Clinic API'
     })
 
+    with _health_cache_lock:
+        _health_cache['body'] = body
+        _health_cache['expires'] = time.monotonic() + HEALTH_CACHE_TTL
+
+    return Response(body, mimetype='application/json')
+
 if __name__ == '__main__':
+    # Local development only - in production run under gunicorn:
+    #   gunicorn -c gunicorn.conf.py app:app
+    database.init_db()
+
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+# Production server config. Run with:
+#   gunicorn -c gunicorn.conf.py app:app
+# Flask's built-in server (app.run) stays for local development only.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# The endpoints are I/O bound (SQLite + SMTP), so threaded workers let each
+# process keep several requests in flight while one waits on I/O. gevent
+# workers are deliberately not offered: monkey-patching turns the
+# threading.local connection cache in database.py into per-greenlet (so
+# per-request) connections that never close, and sqlite3's C calls would
+# block the event loop anyway.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    # Create the schema once in the master, before workers fork, instead of
+    # on every worker import
+    import database
+    database.init_db()